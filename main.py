@@ -1,17 +1,35 @@
 import os
 import re
+import asyncio
+import sys
 import yaml
 import json
+import mmap
 import hmac
 import hashlib
 import logging
+import configparser
 import subprocess
-from fastapi import FastAPI, Request, Query, HTTPException, Header
+import orjson
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from functools import lru_cache, partial
+from operator import itemgetter
+from fastapi import FastAPI, Request, Query, HTTPException, Header, Response
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, ORJSONResponse, StreamingResponse
+from jinja2 import FileSystemBytecodeCache
 from typing import List, Optional
 
+# Prefer the libyaml-backed loader; fall back to the pure-Python one
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
 # =============================================================================
 # LOGGING CONFIGURATION
 # =============================================================================
@@ -30,19 +48,27 @@ logger = logging.getLogger("xql-hub")
 # =============================================================================
 # APPLICATION SETUP
 # =============================================================================
-app = FastAPI(title="XQL Hub", version="1.0.0")
+app = FastAPI(title="XQL Hub", version="1.0.0", default_response_class=ORJSONResponse)
+# Compress HTML/JSON bodies; small responses are not worth the CPU
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
+# Persist compiled template bytecode so restarts skip recompilation
+templates.env.bytecode_cache = FileSystemBytecodeCache()
 
 # =============================================================================
 # CONFIGURATION
 # =============================================================================
 # Webhook secret for GitHub signature verification
 WEBHOOK_SECRET = os.getenv("GITHUB_WEBHOOK_SECRET", "")
+_WEBHOOK_SECRET_BYTES = WEBHOOK_SECRET.encode("utf-8") if WEBHOOK_SECRET else None
 
 # Expected repository for webhook validation (optional but recommended)
 EXPECTED_REPO_URL = os.getenv("EXPECTED_REPO_URL", "")
 
+# Git metadata directory of the deployed checkout (read directly for verification)
+GIT_DIR = ".git"
+
 # Input validation limits
 MAX_SEARCH_QUERY_LENGTH = 500
 MAX_CONTENT_TYPE_LENGTH = 50
@@ -51,13 +77,31 @@ MAX_MITRE_IDS_COUNT = 50
 MAX_LOG_SOURCE_LENGTH = 100
 MAX_SORT_OPTION_LENGTH = 20
 
+# Parsed query files are cached here as JSON sidecars, keyed by source mtime and size
+QUERY_CACHE_DIR = os.path.join("queries", ".cache")
+
+# Worker threads used to read and parse query files in load_queries()
+QUERY_LOAD_WORKERS = min(8, os.cpu_count() or 1)
+
+# Distinct filtered /search results remembered per load of the query set
+SEARCH_CACHE_SIZE = 512
+
 # Allowed values (Allowlist approach)
 VALID_CONTENT_TYPES = frozenset(["bioc", "correlation", "hunting", "hygiene", "widget", "xql"])
 VALID_SORT_OPTIONS = frozenset(["name", "name-desc", "severity", "type"])
 
+# Maximum time a webhook-triggered git pull may take
+GIT_PULL_TIMEOUT = 30
+
 # Webhook event types that trigger content refresh
 ALLOWED_WEBHOOK_EVENTS = frozenset({"push", "workflow_run", "ping"})
 
+# Severity rank used for sorting (unknown severities sort last)
+SEVERITY_ORDER = {'critical': 0, 'high': 1, 'medium': 2, 'low': 3, 'informational': 4, '': 5}
+
+# Query fields indexed for full-text search (tags are indexed as well)
+SEARCHABLE_FIELDS = ('name', 'description', 'author', 'query')
+
 # Regex patterns for validation
 MITRE_ID_PATTERN = re.compile(r"^T\d{4}(\.\d{3})?$")
 
@@ -65,14 +109,44 @@ MITRE_ID_PATTERN = re.compile(r"^T\d{4}(\.\d{3})?$")
 # DATA STORES
 # =============================================================================
 QUERY_DB = []
+PUBLIC_QUERY_DB = []
 FILTER_OPTIONS = {
     "mitre_ids": set(),
     "log_sources": set(),
     "types": set()
 }
+# Derived from QUERY_DB in load_queries(); read-only between reloads
+FILTER_OPTIONS_SORTED = {k: () for k in FILTER_OPTIONS}
+TECHNIQUES_IN_USE = {}
+# Inverted indexes for /search: filter value -> frozenset of positions in
+# QUERY_INDEX["queries"]. Bundled with that list so a request always sees
+# indexes and records from the same load. "search" is that load's memoized
+# filter+sort (see _search_queries), so a reload starts with an empty cache;
+# "presorted"/"rank" hold that load's orderings for every sort option
+# ("presorted" also serves unfiltered /search requests directly).
+QUERY_INDEX = {"queries": [], "content_type": {}, "mitre": {}, "log_source": {},
+               "presorted": {k: [] for k in VALID_SORT_OPTIONS},
+               "rank": {k: [] for k in VALID_SORT_OPTIONS}, "search": None}
 MITRE_DATA = {}
 MITRE_TACTICS = []
 
+# Pre-rendered responses for data that only changes on reload:
+# name -> (body_bytes, etag, media_type) (see build_response_cache)
+RESPONSE_CACHE = {}
+
+# Resolved page templates (see load_templates)
+INDEX_TPL = None
+CARDS_TPL = None
+WIZARD_TPL = None
+
+# Serializes webhook pull + reload so concurrent deliveries don't overlap
+_REFRESH_LOCK = asyncio.Lock()
+
+# Memoized git checks (see verify_git_repository / verify_git_branch).
+# Only successful results are cached so transient failures are retried.
+_GIT_REMOTE_OK: Optional[bool] = None
+_GIT_BRANCH_CACHED: Optional[str] = None
+
 # Content type display mappings
 CONTENT_TYPE_LABELS = {
     "hunting": "Threat Hunting",
@@ -192,7 +266,7 @@ def verify_github_signature(payload: bytes, signature: str) -> bool:
     Verify that the webhook payload was sent by GitHub.
     Uses HMAC-SHA256 to compare the signature.
     """
-    if not WEBHOOK_SECRET:
+    if not _WEBHOOK_SECRET_BYTES:
         logger.error("GITHUB_WEBHOOK_SECRET not configured - rejecting webhook")
         return False
 
@@ -200,13 +274,69 @@ def verify_github_signature(payload: bytes, signature: str) -> bool:
         logger.warning("Invalid or missing webhook signature format")
         return False
 
-    expected_signature = "sha256=" + hmac.new(
-        WEBHOOK_SECRET.encode("utf-8"),
-        payload,
-        hashlib.sha256
-    ).hexdigest()
+    # Compare raw digests rather than hex strings
+    try:
+        provided_digest = bytes.fromhex(signature[7:])
+    except ValueError:
+        logger.warning("Webhook signature is not valid hex")
+        return False
+
+    # One-shot HMAC dispatches straight to OpenSSL
+    expected_digest = hmac.digest(_WEBHOOK_SECRET_BYTES, payload, "sha256")
+
+    return hmac.compare_digest(expected_digest, provided_digest)
+
+
+def _read_git_remote_url(remote: str = "origin") -> Optional[str]:
+    """
+    Read a remote's URL straight from .git/config instead of spawning git.
+    Returns None when the URL cannot be determined reliably this way
+    (missing file, includes, url rewrites, quoted or escaped values, inline
+    comments), so the caller can fall back to the git CLI.
+    """
+    config_path = os.path.join(GIT_DIR, "config")
+    if not os.path.isfile(config_path):
+        return None
 
-    return hmac.compare_digest(expected_signature, signature)
+    parser = configparser.ConfigParser(strict=False, interpolation=None)
+    try:
+        parser.read(config_path, encoding="utf-8")
+    except (configparser.Error, UnicodeDecodeError):
+        return None
+
+    # Only git itself resolves includes and insteadOf rewrites correctly
+    if any(name.startswith(("include", "url ")) for name in parser.sections()):
+        return None
+
+    url = parser.get(f'remote "{remote}"', "url", fallback=None)
+    if not url:
+        return None
+    url = url.strip()
+    # configparser keeps inline comments, quotes and escapes as part of the
+    # value, and joins continuation lines; leave those to git's own parser
+    if not url or any(c in url for c in ';#\\"') or any(c.isspace() for c in url):
+        return None
+    return url
+
+
+def _read_git_head_branch() -> Optional[str]:
+    """
+    Read the checked-out branch from .git/HEAD instead of spawning git.
+    Returns "" for a detached HEAD (like `git branch --show-current`), or
+    None if HEAD cannot be read so the caller can fall back to the git CLI.
+    """
+    head_path = os.path.join(GIT_DIR, "HEAD")
+    if not os.path.isfile(head_path):
+        return None
+
+    try:
+        with open(head_path, "r", encoding="utf-8") as f:
+            head = f.read().strip()
+    except (OSError, UnicodeDecodeError):
+        return None
+
+    prefix = "ref: refs/heads/"
+    return head[len(prefix):] if head.startswith(prefix) else ""
 
 
 def verify_git_repository() -> bool:
@@ -224,23 +354,32 @@ def verify_git_repository() -> bool:
         True if verification passes or is not configured (EXPECTED_REPO_URL empty).
         False if the current git remote doesn't match the expected URL.
     """
+    global _GIT_REMOTE_OK
+
     if not EXPECTED_REPO_URL:
         # No verification configured - allow (but log recommendation in strict mode)
         return True
 
+    # The origin URL does not change during the process lifetime
+    if _GIT_REMOTE_OK:
+        return True
+
     try:
-        result = subprocess.run(
-            ["git", "remote", "get-url", "origin"],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
+        current_url = _read_git_remote_url()
+
+        if current_url is None:
+            result = subprocess.run(
+                ["git", "remote", "get-url", "origin"],
+                capture_output=True,
+                text=True,
+                timeout=5
+            )
 
-        if result.returncode != 0:
-            logger.error("Failed to get git remote URL")
-            return False
+            if result.returncode != 0:
+                logger.error("Failed to get git remote URL")
+                return False
 
-        current_url = result.stdout.strip()
+            current_url = result.stdout.strip()
 
         # Normalize URLs for comparison (handle .git suffix, https vs. git protocols)
         def normalize_url(url):
@@ -252,6 +391,7 @@ def verify_git_repository() -> bool:
             logger.error(f"Repository URL mismatch. Expected: {EXPECTED_REPO_URL}, Got: {current_url}")
             return False
 
+        _GIT_REMOTE_OK = True
         return True
 
     except subprocess.TimeoutExpired:
@@ -266,26 +406,38 @@ def verify_git_branch() -> Optional[str]:
     """
     Get and verify the current git branch.
     Returns branch name if on main/master, None otherwise.
+
+    A valid branch is cached for the process lifetime: the webhook only runs
+    `git pull --ff-only origin <branch>`, which never switches branches.
     """
+    global _GIT_BRANCH_CACHED
+
+    if _GIT_BRANCH_CACHED:
+        return _GIT_BRANCH_CACHED
+
     try:
-        result = subprocess.run(
-            ["git", "branch", "--show-current"],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
+        branch = _read_git_head_branch()
+
+        if branch is None:
+            result = subprocess.run(
+                ["git", "branch", "--show-current"],
+                capture_output=True,
+                text=True,
+                timeout=5
+            )
 
-        if result.returncode != 0:
-            logger.error("Failed to get current git branch")
-            return None
+            if result.returncode != 0:
+                logger.error("Failed to get current git branch")
+                return None
 
-        branch = result.stdout.strip()
+            branch = result.stdout.strip()
         allowed_branches = {"main", "master"}
 
         if branch not in allowed_branches:
             logger.warning(f"Git pull attempted on non-main branch: {branch}")
             return None
 
+        _GIT_BRANCH_CACHED = branch
         return branch
 
     except Exception as e:
@@ -304,8 +456,10 @@ def load_mitre_data():
 
     if os.path.exists(data_file):
         try:
-            with open(data_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            # orjson parses from bytes in one call; its decode error subclasses
+            # json.JSONDecodeError, so the handler below still applies
+            with open(data_file, "rb") as f:
+                data = orjson.loads(f.read())
 
             # New format: { "tactics": [...], "techniques": {...} }
             if "tactics" in data and "techniques" in data:
@@ -352,128 +506,472 @@ def _get_fallback_tactics():
     ]
 
 
-def load_queries():
-    """Load query definitions from YAML files."""
-    global QUERY_DB, FILTER_OPTIONS
-    QUERY_DB = []
-    FILTER_OPTIONS = {k: set() for k in FILTER_OPTIONS}
+def load_templates():
+    """Resolve the page templates once; called again after a webhook pull."""
+    global INDEX_TPL, CARDS_TPL, WIZARD_TPL
+    INDEX_TPL = templates.get_template("index.html")
+    CARDS_TPL = templates.get_template("partials/query_cards.html")
+    WIZARD_TPL = templates.get_template("wizard.html")
 
-    errors = []
 
-    if not os.path.exists("queries"):
-        logger.warning("queries directory not found")
+def _build_search_blob(data: dict) -> str:
+    """
+    Build the lowercased text that /search matches against.
+    Only string values are indexed. Fields are NUL-separated; _search_queries
+    rejects terms containing NUL, so no match can span a field boundary.
+    """
+    parts = [data.get(f, '') for f in SEARCHABLE_FIELDS]
+    parts.extend(data['tags'])
+    return '\x00'.join(p for p in parts if isinstance(p, str)).lower()
+
+
+def _read_query_cache(cache_path: str, st: os.stat_result) -> Optional[dict]:
+    """Return the cached parse of a query file, or None if the sidecar is missing or stale."""
+    try:
+        with open(cache_path, "rb") as f:
+            cached = orjson.loads(f.read())
+    except (OSError, orjson.JSONDecodeError):
+        return None
+
+    if (not isinstance(cached, dict) or cached.get("mtime_ns") != st.st_mtime_ns
+            or cached.get("size") != st.st_size or not isinstance(cached.get("data"), dict)):
+        return None
+    return cached["data"]
+
+
+def _write_query_cache(cache_path: str, st: os.stat_result, data) -> None:
+    """Store a parsed query file as a JSON sidecar; best effort, failures are only logged."""
+    if not isinstance(data, dict):
         return
 
-    for filename in os.listdir("queries"):
-        if not filename.endswith((".yaml", ".yml")):
-            continue
+    try:
+        payload = orjson.dumps({"mtime_ns": st.st_mtime_ns, "size": st.st_size, "data": data})
+    except TypeError:
+        # Non-string keys or types JSON can't represent
+        return
+    # Only cache documents that survive a JSON round trip unchanged (e.g. no YAML dates)
+    if orjson.loads(payload)["data"] != data:
+        return
+
+    try:
+        os.makedirs(QUERY_CACHE_DIR, exist_ok=True)
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.debug(f"Could not write query cache {cache_path}: {e}")
 
-        filepath = os.path.join("queries", filename)
 
+def _prune_query_cache(filenames: set) -> None:
+    """Remove sidecars whose query file was deleted or renamed; best effort."""
+    try:
+        with os.scandir(QUERY_CACHE_DIR) as it:
+            stale = [
+                e.path for e in it
+                if e.name.endswith(".json") and e.name[:-len(".json")] not in filenames
+            ]
+    except OSError:
+        # No cache directory yet
+        return
+
+    for path in stale:
         try:
-            with open(filepath, "r", encoding="utf-8") as f:
-                data = yaml.safe_load(f)
+            os.remove(path)
+        except OSError as e:
+            logger.debug(f"Could not remove stale query cache {path}: {e}")
 
-            if not isinstance(data, dict):
-                errors.append(f"{filename}: YAML root must be a dictionary")
-                continue
 
-            data['id'] = filename
+def _isoformat_dates(data: dict) -> dict:
+    """
+    Replace YAML timestamps (e.g. an unquoted `created: 2025-01-10`) with their
+    ISO strings, in place, so every query stays JSON-serializable.
+    """
+    for key, value in data.items():
+        if isinstance(value, date):
+            # datetime is a date subclass; both have isoformat()
+            data[key] = value.isoformat()
+        elif isinstance(value, list):
+            data[key] = [v.isoformat() if isinstance(v, date) else v for v in value]
+    return data
 
-            # Data Normalization with validation
-            if 'content_type' not in data or data['content_type'] not in VALID_CONTENT_TYPES:
-                data['content_type'] = 'xql'
 
-            if 'mitre_ids' not in data or not isinstance(data['mitre_ids'], list):
-                data['mitre_ids'] = []
-            else:
-                # Validate MITRE IDs
-                data['mitre_ids'] = [
-                    mid for mid in data['mitre_ids']
-                    if isinstance(mid, str) and MITRE_ID_PATTERN.match(mid.upper())
-                ]
+def _parse_query_file(filepath: str, st: os.stat_result):
+    """
+    Read and parse a single query YAML file (runs in a worker thread).
+    A fresh JSON sidecar in QUERY_CACHE_DIR, keyed on st, is used instead of
+    re-parsing the YAML.
+    """
+    cache_path = os.path.join(QUERY_CACHE_DIR, os.path.basename(filepath) + ".json")
 
-            if 'log_sources' not in data or not isinstance(data['log_sources'], list):
-                data['log_sources'] = []
+    data = _read_query_cache(cache_path, st)
+    if data is not None:
+        return data
 
-            if 'tags' not in data or not isinstance(data['tags'], list):
-                data['tags'] = []
+    # Binary mode lets the C loader skip the text-decoding layer
+    with open(filepath, "rb") as f:
+        # Empty files cannot be mapped; parse them as-is (yields None)
+        if st.st_size == 0:
+            data = yaml.load(f, Loader=_YamlLoader)
+        else:
+            # Feed the loader from a read-only mapping instead of buffered reads
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                data = yaml.load(mm, Loader=_YamlLoader)
 
-            # Populate Filter Lists
-            FILTER_OPTIONS["types"].add(data['content_type'])
+    if isinstance(data, dict):
+        _isoformat_dates(data)
+    _write_query_cache(cache_path, st, data)
+    return data
+
+
+def _intern_strings(values: list) -> list:
+    """Intern the string items of a list, leaving other items untouched."""
+    return [sys.intern(v) if isinstance(v, str) else v for v in values]
+
+
+def _char_mask(text: str) -> int:
+    """Bitmask of the UTF-8 byte values present in text (bit n set if byte n occurs)."""
+    mask = 0
+    for b in set(text.encode("utf-8")):
+        mask |= 1 << b
+    return mask
+
+
+def _load_query_file(entry: os.DirEntry) -> dict:
+    """
+    Parse and normalize one query file (runs in a worker thread).
+    Raises ValueError if the document is not a mapping.
+    """
+    # DirEntry.stat() is cached on the entry, so the sidecar check costs no extra stat
+    data = _parse_query_file(entry.path, entry.stat())
+
+    if not isinstance(data, dict):
+        raise ValueError("YAML root must be a dictionary")
+
+    data['id'] = entry.name
+
+    # Data Normalization with validation. Values repeated across
+    # files are interned so each distinct string is stored once.
+    if 'content_type' not in data or data['content_type'] not in VALID_CONTENT_TYPES:
+        data['content_type'] = 'xql'
+    data['content_type'] = sys.intern(data['content_type'])
+
+    if 'mitre_ids' not in data or not isinstance(data['mitre_ids'], list):
+        data['mitre_ids'] = []
+    else:
+        # Validate MITRE IDs and store them in canonical (uppercase) form
+        # so request-time code never has to normalize them again
+        canonical = (mid.upper() for mid in data['mitre_ids'] if isinstance(mid, str))
+        data['mitre_ids'] = [
+            sys.intern(mid) for mid in canonical if MITRE_ID_PATTERN.match(mid)
+        ]
+
+    if 'log_sources' not in data or not isinstance(data['log_sources'], list):
+        data['log_sources'] = []
+    else:
+        data['log_sources'] = _intern_strings(data['log_sources'])
+
+    if 'tags' not in data or not isinstance(data['tags'], list):
+        data['tags'] = []
+    else:
+        data['tags'] = _intern_strings(data['tags'])
+
+    # Precomputed search/sort keys (kept out of the public payload)
+    data['_search_blob'] = _build_search_blob(data)
+    data['_search_mask'] = _char_mask(data['_search_blob'])
+    data['_sort_name'] = str(data.get('name', '')).lower()
+    data['_sort_sev'] = SEVERITY_ORDER.get(str(data.get('severity', '')).lower(), 5)
+    data['_sort_type'] = str(data['content_type'])
+
+    return data
+
+
+def load_queries():
+    """
+    Load query definitions from YAML files.
+
+    Everything is built into locals and published at the end, so requests
+    served while a reload runs in a worker thread never see a partial state.
+    """
+    global QUERY_DB, PUBLIC_QUERY_DB, FILTER_OPTIONS, FILTER_OPTIONS_SORTED, TECHNIQUES_IN_USE
+    global QUERY_INDEX
+    query_db = []
+    filter_options = {k: set() for k in FILTER_OPTIONS}
+    by_content_type = defaultdict(set)
+    by_mitre = defaultdict(set)
+    by_log_source = defaultdict(set)
+
+    errors = []
+    entries = []
+
+    if os.path.exists("queries"):
+        # Single directory walk; DirEntry caches the file type from readdir
+        with os.scandir("queries") as it:
+            entries = [
+                e for e in it
+                if e.name.endswith((".yaml", ".yml")) and e.is_file()
+            ]
+    else:
+        logger.warning("queries directory not found")
+    file_count = len(entries)
+
+    # Read, parse and normalize files concurrently; only the filter-set
+    # merges below stay single-threaded, in directory order
+    with ThreadPoolExecutor(max_workers=QUERY_LOAD_WORKERS) as executor:
+        futures = [executor.submit(_load_query_file, entry) for entry in entries]
+
+    for entry, future in zip(entries, futures):
+        filename = entry.name
+
+        try:
+            data = future.result()
+            position = len(query_db)
+
+            # Populate Filter Lists and inverted indexes
+            filter_options["types"].add(data['content_type'])
+            by_content_type[data['content_type']].add(position)
 
             for mid in data['mitre_ids']:
-                FILTER_OPTIONS["mitre_ids"].add(mid)
+                filter_options["mitre_ids"].add(mid)
+                # Index under the base technique too, so selecting a base ID
+                # also matches its sub-techniques
+                by_mitre[mid].add(position)
+                by_mitre[mid.partition('.')[0]].add(position)
 
             for src in data['log_sources']:
                 if isinstance(src, str):
-                    FILTER_OPTIONS["log_sources"].add(src)
+                    filter_options["log_sources"].add(src)
+                    by_log_source[src].add(position)
 
-            QUERY_DB.append(data)
+            query_db.append(data)
 
         except yaml.YAMLError as e:
             errors.append(f"{filename}: Invalid YAML - {e}")
         except Exception as e:
             errors.append(f"{filename}: {e}")
 
+    # Publish everything at once
+    QUERY_DB = query_db
+    # Sort once per option; rank[option][i] is query i's place in that order
+    presorted = {
+        sort_option: sort_queries(list(query_db), sort_option)
+        for sort_option in VALID_SORT_OPTIONS
+    }
+    position_of = {id(q): i for i, q in enumerate(query_db)}
+    rank = {}
+    for sort_option, ordered in presorted.items():
+        option_rank = [0] * len(query_db)
+        for r, q in enumerate(ordered):
+            option_rank[position_of[id(q)]] = r
+        rank[sort_option] = option_rank
+
+    index = {
+        "queries": query_db,
+        "content_type": {k: frozenset(v) for k, v in by_content_type.items()},
+        "mitre": {k: frozenset(v) for k, v in by_mitre.items()},
+        "log_source": {k: frozenset(v) for k, v in by_log_source.items()},
+        "presorted": presorted,
+        "rank": rank
+    }
+    index["search"] = lru_cache(maxsize=SEARCH_CACHE_SIZE)(partial(_search_queries, index))
+    QUERY_INDEX = index
+    FILTER_OPTIONS = filter_options
+    # Homepage embeds the queries as JSON; strip the private derived keys
+    PUBLIC_QUERY_DB = [
+        {k: v for k, v in q.items() if not k.startswith('_')} for q in query_db
+    ]
+    # Filter lists and the matrix view only change here, so build them once
+    FILTER_OPTIONS_SORTED = {k: tuple(sorted(v)) for k, v in filter_options.items()}
+    TECHNIQUES_IN_USE = organize_mitre_by_tactic(query_db)
+
+    _prune_query_cache({e.name for e in entries})
+
     # Log summary
-    logger.info(f"Loaded {len(QUERY_DB)} queries from {len(os.listdir('queries'))} files")
+    logger.info(f"Loaded {len(query_db)} queries from {file_count} files")
 
     if errors:
         for error in errors:
             logger.error(f"Query load error: {error}")
 
 
-# Initialize data on startup
-load_mitre_data()
-load_queries()
+def build_response_cache():
+    """
+    Serialize the static /api/* responses and render the full pages once.
+    Must run after templates, MITRE data and queries are loaded, and again after every reload.
+    """
+    global RESPONSE_CACHE
+
+    # Each body is built on its own: a page that fails to render is logged and
+    # answered with a 500 (see cached_response) without blocking the others
+    builders = {
+        "filters": (lambda: orjson.dumps({
+            "types": FILTER_OPTIONS_SORTED["types"],
+            "log_sources": FILTER_OPTIONS_SORTED["log_sources"],
+            "mitre_ids": FILTER_OPTIONS_SORTED["mitre_ids"],
+            "tactics": MITRE_TACTICS,
+            "mitre_data": MITRE_DATA
+        }), "application/json"),
+        "content_types": (lambda: orjson.dumps(CONTENT_TYPE_LABELS), "application/json"),
+        "mitre": (lambda: orjson.dumps({
+            "tactics": MITRE_TACTICS,
+            "techniques": MITRE_DATA
+        }), "application/json"),
+        "index": (lambda: INDEX_TPL.render({
+            "queries": PUBLIC_QUERY_DB,
+            "filters": FILTER_OPTIONS_SORTED,
+            "tactics": MITRE_TACTICS,
+            "techniques_in_use": TECHNIQUES_IN_USE,
+            "mitre_data": MITRE_DATA,
+            "content_type_labels": CONTENT_TYPE_LABELS
+        }).encode("utf-8"), "text/html; charset=utf-8"),
+        "contribute": (lambda: WIZARD_TPL.render({
+            "tactics": MITRE_TACTICS,
+            "mitre_data": MITRE_DATA
+        }).encode("utf-8"), "text/html; charset=utf-8")
+    }
+
+    cache = {}
+    for name, (build, media_type) in builders.items():
+        try:
+            body = build()
+        except Exception as e:
+            logger.error(f"Failed to pre-render '{name}' response: {e}")
+            continue
+        # Weak tag: the same entity is also served gzip-encoded
+        etag = 'W/"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        cache[name] = (body, etag, media_type)
+    RESPONSE_CACHE = cache
 
 
 # =============================================================================
 # HELPER FUNCTIONS
 # =============================================================================
-def organize_mitre_by_tactic():
-    """Organize available MITRE IDs by tactic for the matrix view."""
-    techniques_in_use = {}
-    for query in QUERY_DB:
-        for mid in query.get('mitre_ids', []):
-            if not isinstance(mid, str):
-                continue
-            base_id = mid.split('.')[0]
-            if base_id not in techniques_in_use:
-                techniques_in_use[base_id] = {
-                    'id': base_id,
-                    'subtechniques': set()
-                }
-            if '.' in mid:
-                techniques_in_use[base_id]['subtechniques'].add(mid)
+def organize_mitre_by_tactic(queries: list) -> dict:
+    """
+    Organize available MITRE IDs by tactic for the matrix view.
+    Called once per load_queries(); the result is served from TECHNIQUES_IN_USE.
+    """
+    # mitre_ids are validated strings after load_queries normalization
+    subtechniques = defaultdict(set)
+    for query in queries:
+        for mid in query['mitre_ids']:
+            base_id, dot, _ = mid.partition('.')
+            if dot:
+                subtechniques[base_id].add(mid)
+            else:
+                subtechniques[base_id]  # register the base technique
 
-    return techniques_in_use
+    # Sorted lists rather than sets: deterministic order and JSON-serializable
+    return {
+        base_id: {'id': base_id, 'subtechniques': sorted(subtechniques[base_id])}
+        for base_id in sorted(subtechniques)
+    }
+
+
+def sort_queries(queries: list, sort_by: str) -> list:
+    """Sort a list of queries in place by a validated sort option and return it."""
+    # Sort keys are precomputed in load_queries
+    if sort_by == "name":
+        queries.sort(key=itemgetter('_sort_name'))
+    elif sort_by == "name-desc":
+        queries.sort(key=itemgetter('_sort_name'), reverse=True)
+    elif sort_by == "severity":
+        queries.sort(key=itemgetter('_sort_sev'))
+    elif sort_by == "type":
+        queries.sort(key=itemgetter('_sort_type'))
+    return queries
 
 
-def safe_search_match(query_item: dict, search_term: str) -> bool:
+def _search_queries(index: dict, search_query: str, content_type: str,
+                    mitre_ids: tuple, log_source: str, sort_by: str) -> tuple:
     """
-    Safely check if a search term matches a query item.
-    Avoids potential issues with very large or malformed data.
+    Filter one load's queries for /search, in sort_by order.
+    Bound to its index and wrapped in an LRU cache by load_queries(); the
+    cached tuple holds references into index["queries"], not copies.
     """
-    try:
-        # Only search specific fields, not the entire serialized object
-        searchable_fields = ['name', 'description', 'author', 'query']
-        searchable_tags = query_item.get('tags', [])
+    queries = index["queries"]
 
-        for field in searchable_fields:
-            value = query_item.get(field, '')
-            if isinstance(value, str) and search_term in value.lower():
-                return True
+    # 1. Narrow by the exact-match filters through the inverted indexes
+    candidate_sets = []
+    if content_type:
+        candidate_sets.append(index["content_type"].get(content_type, frozenset()))
+    if mitre_ids:
+        # Multi-select: match ANY selected technique
+        candidate_sets.append(frozenset().union(*(index["mitre"].get(m, ()) for m in mitre_ids)))
+    if log_source:
+        candidate_sets.append(index["log_source"].get(log_source, frozenset()))
+
+    if candidate_sets:
+        # Intersect starting from the most selective set
+        candidate_sets.sort(key=len)
+        positions = candidate_sets[0].intersection(*candidate_sets[1:])
+        # Ordering positions by rank yields the same order as a stable sort
+        # of the load-order subset, without comparing sort keys
+        candidates = (queries[i] for i in sorted(positions, key=index["rank"][sort_by].__getitem__))
+    else:
+        # Only a text search is left; the presorted list is already in order
+        candidates = index["presorted"][sort_by]
 
-        # Search tags
-        for tag in searchable_tags:
-            if isinstance(tag, str) and search_term in tag.lower():
-                return True
+    # 2. Text Search, fused with the candidate walk into a single pass (blob precomputed
+    # in load_queries). A query byte missing from an item's mask rules it out without a
+    # substring scan.
+    if search_query:
+        # NUL separates fields in the blob; such a term could only match across fields
+        if '\x00' in search_query:
+            return ()
+        q_mask = _char_mask(search_query)
+        filtered = [
+            x for x in candidates
+            if not q_mask & ~x['_search_mask'] and search_query in x['_search_blob']
+        ]
+    else:
+        filtered = list(candidates)
+
+    # Candidates were walked in sort order, so the result needs no sort
+    return tuple(filtered)
+
+
+def render_query_cards(request: Request, queries: list) -> StreamingResponse:
+    """Stream the query cards partial for a list of queries."""
+    # Streaming avoids rendering large result sets into one string;
+    # buffering groups Jinja's small fragments into fewer chunks
+    stream = CARDS_TPL.stream({
+        "request": request,
+        "queries": queries
+    })
+    stream.enable_buffering(64)
+    return StreamingResponse(stream, media_type="text/html")
 
-        return False
-    except Exception:
-        return False
+
+def cached_response(request: Request, name: str) -> Response:
+    """Serve a pre-rendered response, answering 304 if the client's ETag matches."""
+    cached = RESPONSE_CACHE.get(name)
+    if cached is None:
+        # Rendering failed during the last reload (already logged)
+        return Response(content="Internal Server Error", status_code=500, media_type="text/plain")
+    body, etag, media_type = cached
+    headers = {"ETag": etag}
+
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match:
+        # Weak comparison (RFC 9110): ignore W/ prefixes, which proxies may add or drop
+        client_tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+        if etag.removeprefix("W/") in client_tags or "*" in client_tags:
+            return Response(status_code=304, headers=headers)
+
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def reload_content():
+    """Reload templates, MITRE data, queries and cached responses (blocking)."""
+    load_templates()
+    load_mitre_data()
+    load_queries()
+    build_response_cache()
+
+
+# Initialize data on startup
+reload_content()
 
 
 # =============================================================================
@@ -482,27 +980,13 @@ def safe_search_match(query_item: dict, search_term: str) -> bool:
 @app.get("/", response_class=HTMLResponse)
 async def homepage(request: Request):
     """Render the landing page with all queries and filters available."""
-    techniques_in_use = organize_mitre_by_tactic()
-
-    return templates.TemplateResponse("index.html", {
-        "request": request,
-        "queries": QUERY_DB,
-        "filters": {k: sorted(list(v)) for k, v in FILTER_OPTIONS.items()},
-        "tactics": MITRE_TACTICS,
-        "techniques_in_use": techniques_in_use,
-        "mitre_data": MITRE_DATA,
-        "content_type_labels": CONTENT_TYPE_LABELS
-    })
+    return cached_response(request, "index")
 
 
 @app.get("/contribute", response_class=HTMLResponse)
 async def contribute_wizard(request: Request):
     """Render the contribution wizard page."""
-    return templates.TemplateResponse("wizard.html", {
-        "request": request,
-        "tactics": MITRE_TACTICS,
-        "mitre_data": MITRE_DATA
-    })
+    return cached_response(request, "contribute")
 
 
 @app.get("/search", response_class=HTMLResponse)
@@ -524,87 +1008,39 @@ async def search(
     log_source = validate_log_source(log_source)
     sort_by = validate_sort_option(sort_by)
 
-    filtered = list(QUERY_DB)
-
-    # 1. Text Search (using the safe search function)
-    if search_query:
-        filtered = [x for x in filtered if safe_search_match(x, search_query)]
-
-    # 2. Filter by Content Type
-    if content_type and content_type != "all":
-        filtered = [x for x in filtered if x.get('content_type') == content_type]
-
-    # 3. Filter by MITRE (multi-select - match ANY selected)
-    if mitre_ids:
-        def matches_mitre(query_item):
-            query_mitre = query_item.get('mitre_ids', [])
-            if not isinstance(query_mitre, list):
-                return False
-            for selected in mitre_ids:
-                for qm in query_mitre:
-                    if isinstance(qm, str) and (qm == selected or qm.startswith(selected + '.')):
-                        return True
-            return False
+    # Unfiltered requests (e.g. the initial page load) skip all filter/sort stages
+    if (not search_query and content_type in ("", "all") and not mitre_ids
+            and log_source in ("", "all")):
+        return render_query_cards(request, QUERY_INDEX["presorted"][sort_by])
 
-        filtered = [x for x in filtered if matches_mitre(x)]
-
-    # 4. Filter by Log Source
-    if log_source and log_source != "all":
-        filtered = [
-            x for x in filtered
-            if log_source in x.get('log_sources', [])
-        ]
+    # Normalized key: "all" means no filter, and the MITRE selection is a set
+    results = QUERY_INDEX["search"](
+        search_query,
+        "" if content_type == "all" else content_type,
+        tuple(sorted(set(mitre_ids))),
+        "" if log_source == "all" else log_source,
+        sort_by
+    )
 
-    # 5. Sorting
-    severity_order = {'critical': 0, 'high': 1, 'medium': 2, 'low': 3, 'informational': 4, '': 5}
+    return render_query_cards(request, results)
 
-    try:
-        if sort_by == "name":
-            filtered = sorted(filtered, key=lambda x: str(x.get('name', '')).lower())
-        elif sort_by == "name-desc":
-            filtered = sorted(filtered, key=lambda x: str(x.get('name', '')).lower(), reverse=True)
-        elif sort_by == "severity":
-            filtered = sorted(
-                filtered,
-                key=lambda x: severity_order.get(str(x.get('severity', '')).lower(), 5)
-            )
-        elif sort_by == "type":
-            filtered = sorted(filtered, key=lambda x: str(x.get('content_type', '')))
-    except Exception as e:
-        logger.error(f"Error sorting results: {e}")
-        # Return unsorted on error
 
-    return templates.TemplateResponse("partials/query_cards.html", {
-        "request": request,
-        "queries": filtered
-    })
-
-
-@app.get("/api/filters", response_class=JSONResponse)
-async def get_filters():
+@app.get("/api/filters", response_class=ORJSONResponse, response_model=None)
+async def get_filters(request: Request):
     """API endpoint to get all available filter options."""
-    return {
-        "types": sorted(list(FILTER_OPTIONS["types"])),
-        "log_sources": sorted(list(FILTER_OPTIONS["log_sources"])),
-        "mitre_ids": sorted(list(FILTER_OPTIONS["mitre_ids"])),
-        "tactics": MITRE_TACTICS,
-        "mitre_data": MITRE_DATA
-    }
+    return cached_response(request, "filters")
 
 
-@app.get("/api/content-types", response_class=JSONResponse)
-async def get_content_types():
+@app.get("/api/content-types", response_class=ORJSONResponse, response_model=None)
+async def get_content_types(request: Request):
     """API endpoint to get content type labels."""
-    return CONTENT_TYPE_LABELS
+    return cached_response(request, "content_types")
 
 
-@app.get("/api/mitre", response_class=JSONResponse)
-async def get_mitre_data():
+@app.get("/api/mitre", response_class=ORJSONResponse, response_model=None)
+async def get_mitre_data(request: Request):
     """API endpoint to get full MITRE ATT&CK data."""
-    return {
-        "tactics": MITRE_TACTICS,
-        "techniques": MITRE_DATA
-    }
+    return cached_response(request, "mitre")
 
 
 @app.post("/webhook/refresh")
@@ -662,28 +1098,43 @@ async def refresh_content(
         )
 
     try:
-        # Pull the latest code from git with strict options
-        # --ff-only: Only fast-forward, fail if diverged
-        # This prevents unexpected merges
-        result = subprocess.run(
-            ["git", "pull", "--ff-only", "origin", branch],
-            check=True,
-            capture_output=True,
-            text=True,
-            timeout=30,
-            env={
-                **os.environ,
-                # Disable git hooks that could execute arbitrary code
-                "GIT_HOOKS_PATH": "/dev/null",
-                # Disable credential helpers
-                "GIT_ASKPASS": "/bin/true",
-                "GIT_TERMINAL_PROMPT": "0"
-            }
-        )
-
-        # Reload MITRE data and queries into memory
-        load_mitre_data()
-        load_queries()
+        async with _REFRESH_LOCK:
+            # Pull the latest code from git with strict options
+            # --ff-only: Only fast-forward, fail if diverged
+            # This prevents unexpected merges
+            # Run as an asyncio subprocess so the event loop keeps serving requests
+            proc = await asyncio.create_subprocess_exec(
+                "git", "pull", "--ff-only", "origin", branch,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                env={
+                    **os.environ,
+                    # Disable git hooks that could execute arbitrary code
+                    "GIT_HOOKS_PATH": "/dev/null",
+                    # Disable credential helpers
+                    "GIT_ASKPASS": "/bin/true",
+                    "GIT_TERMINAL_PROMPT": "0"
+                }
+            )
+            try:
+                stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=GIT_PULL_TIMEOUT)
+            except asyncio.TimeoutError:
+                proc.kill()
+                await proc.wait()
+                raise
+
+            git_stdout = stdout.decode("utf-8", errors="replace")
+            if proc.returncode != 0:
+                raise subprocess.CalledProcessError(
+                    proc.returncode,
+                    ["git", "pull", "--ff-only", "origin", branch],
+                    output=git_stdout,
+                    stderr=stderr.decode("utf-8", errors="replace")
+                )
+
+            # Reload templates, MITRE data and queries off the event loop
+            # (blocking file IO and YAML parsing)
+            await asyncio.to_thread(reload_content)
 
         logger.info(f"Webhook refresh completed successfully on branch {branch}")
 
@@ -691,10 +1142,10 @@ async def refresh_content(
             "status": "success",
             "message": "Content updated",
             "branch": branch,
-            "git_output": result.stdout.strip() if result.stdout else "Up to date"
+            "git_output": git_stdout.strip() if git_stdout else "Up to date"
         }
 
-    except subprocess.TimeoutExpired:
+    except asyncio.TimeoutError:
         logger.error("Git pull timed out")
         raise HTTPException(status_code=504, detail="Git pull timed out")
     except subprocess.CalledProcessError as e:
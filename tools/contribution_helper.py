@@ -25,6 +25,12 @@ from typing import Any, Dict, List, Optional, Tuple
 
 import yaml
 
+# Prefer the libyaml-backed loader/dumper; fall back to the pure-Python ones
+try:
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeLoader, SafeDumper
+
 # =============================================================================
 # CONSTANTS
 # =============================================================================
@@ -45,7 +51,10 @@ CONTENT_TYPE_SUBDIRS = {
     'widget': 'widgets'
 }
 
-MITRE_ID_PATTERN = re.compile(r'^T\d{4}(\.\d{3})?$')
+MITRE_ID_PATTERN = re.compile(r'T\d{4}(\.\d{3})?')
+CODE_FENCE = '```'
+YAML_FENCE_OPENERS = ('```yaml', '```yml')
+FILENAME_UNSAFE_PATTERN = re.compile(r'[^a-z0-9]+')
 
 
 # =============================================================================
@@ -113,12 +122,23 @@ def extract_yaml_content(issue_body: str) -> Tuple[Optional[str], Optional[str]]
     Returns:
         Tuple of (yaml_content, error_message). If successful, error_message is None.
     """
-    yaml_match = re.search(r'```ya?ml\s*(.*?)\s*```', issue_body, re.DOTALL)
-
-    if not yaml_match:
+    # Plain str.find scan: linear on any input, unlike a lazy DOTALL regex
+    yaml_content = None
+    start = issue_body.find(CODE_FENCE)
+    while start != -1:
+        opener = next((o for o in YAML_FENCE_OPENERS if issue_body.startswith(o, start)), None)
+        if opener:
+            content_start = start + len(opener)
+            end = issue_body.find(CODE_FENCE, content_start)
+            if end != -1:
+                yaml_content = issue_body[content_start:end]
+            break
+        start = issue_body.find(CODE_FENCE, start + 1)
+
+    if yaml_content is None:
         return None, "No YAML code block found in issue body"
 
-    yaml_content = yaml_match.group(1).strip()
+    yaml_content = yaml_content.strip()
 
     if not yaml_content:
         return None, "YAML code block is empty"
@@ -140,11 +160,11 @@ def parse_yaml(yaml_content: str) -> Tuple[Optional[Dict[str, Any]], Optional[st
         Tuple of (parsed_data, error_message). If successful, error_message is None.
     """
     try:
-        data = yaml.safe_load(yaml_content)
+        data = yaml.load(yaml_content, Loader=SafeLoader)
     except yaml.YAMLError as e:
         return None, f"Invalid YAML syntax: {e}"
 
-    # yaml.safe_load can return various types (dict, list, str, int, None)
+    # Safe loading can return various types (dict, list, str, int, None)
     # We require a dictionary for contribution data
     if not isinstance(data, dict):
         type_name = type(data).__name__ if data is not None else "empty/null"
@@ -202,7 +222,7 @@ def validate_contribution(data: Dict[str, Any]) -> ValidationResult:
     for mid in data.get('mitre_ids', []):
         if not isinstance(mid, str):
             errors.append(f"MITRE ID must be a string, got: {type(mid).__name__}")
-        elif not MITRE_ID_PATTERN.match(mid):
+        elif not MITRE_ID_PATTERN.fullmatch(mid):
             errors.append(f"Invalid MITRE technique ID format: {mid}")
 
     # Generate filename
@@ -232,7 +252,7 @@ def generate_filename(name: str) -> str:
         return 'unnamed_query'
 
     # Convert to lowercase and replace non-alphanumeric with underscores
-    filename = re.sub(r'[^a-z0-9]+', '_', name.lower()).strip('_')
+    filename = FILENAME_UNSAFE_PATTERN.sub('_', name.lower()).strip('_')
 
     # Limit length
     filename = filename[:MAX_FILENAME_LENGTH]
@@ -312,8 +332,12 @@ def write_yaml_file(data: Dict[str, Any], filepath: str) -> Optional[str]:
         if dir_path:
             os.makedirs(dir_path, exist_ok=True)
 
+        # Serialize first, then write once: one write() call instead of many
+        # small ones, and a dump error never leaves a truncated file behind
+        text = yaml.dump(data, Dumper=SafeDumper, default_flow_style=False, sort_keys=False, allow_unicode=True)
+
         with open(filepath, 'w', encoding='utf-8') as f:
-            yaml.dump(data, f, default_flow_style=False, sort_keys=False, allow_unicode=True)
+            f.write(text)
 
         return None
     except IOError as e:
@@ -346,50 +370,65 @@ def write_github_output(outputs: Dict[str, str]) -> Optional[str]:
         return f"Failed to write GitHub output: {e}"
 
 
-def print_error(message: str) -> None:
-    """Print an error message in GitHub Actions format."""
-    print(f"::error::{message}")
+def print_annotations(level: str, messages: List[str]) -> None:
+    """Print GitHub Actions messages ('error' or 'warning') in a single write."""
+    if messages:
+        sys.stdout.write(''.join(f"::{level}::{m}\n" for m in messages))
 
 
-def print_warning(message: str) -> None:
-    """Print a warning message in GitHub Actions format."""
-    print(f"::warning::{message}")
+def print_error(message: str) -> None:
+    """Print an error message in GitHub Actions format."""
+    print_annotations('error', [message])
 
 
 # =============================================================================
 # MAIN ENTRY POINTS
 # =============================================================================
-def run_validation() -> int:
+def _load_and_validate() -> Optional[ValidationResult]:
     """
-    Main entry point for validation workflow.
+    Shared pipeline of both entry points: load the issue body, extract and
+    parse its YAML block, and validate it. Errors are reported as they occur.
 
     Returns:
-        Exit code (0 for success, 1 for failure).
+        The successful ValidationResult, or None if any step failed.
     """
     # Load issue body
     issue_body, error = load_issue_body()
     if error:
         print_error(error)
-        return 1
+        return None
 
     # Extract YAML
     yaml_content, error = extract_yaml_content(issue_body)
     if error:
         print_error(error)
-        return 1
+        return None
 
     # Parse YAML
     data, error = parse_yaml(yaml_content)
     if error:
         print_error(error)
-        return 1
+        return None
 
     # Validate
     result = validate_contribution(data)
 
     if not result.success:
-        for err in result.errors:
-            print_error(err)
+        print_annotations('error', result.errors)
+        return None
+
+    return result
+
+
+def run_validation() -> int:
+    """
+    Main entry point for validation workflow.
+
+    Returns:
+        Exit code (0 for success, 1 for failure).
+    """
+    result = _load_and_validate()
+    if result is None:
         return 1
 
     # Write outputs
@@ -404,8 +443,7 @@ def run_validation() -> int:
         return 1
 
     print("✅ Validation passed!")
-    for warning in result.warnings:
-        print_warning(warning)
+    print_annotations('warning', result.warnings)
 
     return 0
 
@@ -417,30 +455,8 @@ def run_extraction() -> int:
     Returns:
         Exit code (0 for success, 1 for failure).
     """
-    # Load issue body
-    issue_body, error = load_issue_body()
-    if error:
-        print_error(error)
-        return 1
-
-    # Extract YAML
-    yaml_content, error = extract_yaml_content(issue_body)
-    if error:
-        print_error(error)
-        return 1
-
-    # Parse YAML
-    data, error = parse_yaml(yaml_content)
-    if error:
-        print_error(error)
-        return 1
-
-    # Validate
-    result = validate_contribution(data)
-
-    if not result.success:
-        for err in result.errors:
-            print_error(err)
+    result = _load_and_validate()
+    if result is None:
         return 1
 
     # Add created date
@@ -1,32 +1,86 @@
 import requests
-import json
-import os
+import orjson
+import sys
+from operator import itemgetter
+from pathlib import Path
+
+# Optional: stream-parse the bundle instead of materializing it
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
 # Source: MITRE CTI GitHub (Enterprise ATT&CK)
 url = "https://raw.githubusercontent.com/mitre/cti/master/enterprise-attack/enterprise-attack.json"
 
+# Output files, and the ETag of the bundle they were built from
+DATA_FILE = Path("data/mitre_data.json")
+STATIC_FILE = Path("static/mitre_data.json")
+ETAG_FILE = Path("data/mitre_data.etag")
+
+# Conditional GET: only send the stored ETag if the outputs it describes exist
+request_headers = {}
+if ETAG_FILE.exists() and DATA_FILE.exists() and STATIC_FILE.exists():
+    stored_etag = ETAG_FILE.read_text().strip()
+    if stored_etag:
+        request_headers["If-None-Match"] = stored_etag
+
 print(f"Downloading MITRE ATT&CK data from {url}...")
-data = requests.get(url).json()
+response = requests.get(url, headers=request_headers, stream=ijson is not None)
+
+if response.status_code == 304:
+    print("MITRE ATT&CK data unchanged upstream (ETag match), nothing to do")
+    sys.exit(0)
+response.raise_for_status()
+
+if ijson is not None:
+    # Yield one STIX object at a time; the full bundle (mostly relationships,
+    # groups and software we discard) is never held in memory
+    response.raw.decode_content = True
+    objects = ijson.items(response.raw, 'objects.item')
+else:
+    objects = orjson.loads(response.content)['objects']
 
 # ============================================================================
-# TACTICS EXTRACTION
+# OBJECT SCAN
 # ============================================================================
-# Extract tactics directly from the MITRE data source
+# Single pass over the STIX objects. Tactics are extracted directly; techniques
+# are buffered because their tactic slugs can only be resolved once all
+# tactics have been seen.
 tactics_map = {}
+technique_objects = []
+
+for obj in objects:
+    obj_type = obj['type']
+    if obj_type != 'x-mitre-tactic' and obj_type != 'attack-pattern':
+        continue
+    if obj.get('revoked', False):
+        continue
+
+    external_refs = obj.get('external_references', [])
+    # Plain loop rather than next(<genexpr>): no generator frame per object
+    external_id = None
+    for ref in external_refs:
+        if ref['source_name'] == 'mitre-attack':
+            external_id = ref['external_id']
+            break
+    if not external_id:
+        continue
+
+    if obj_type == 'x-mitre-tactic':
+        # x_mitre_shortname is the kill chain phase name (e.g., "initial-access")
+        shortname = obj.get('x_mitre_shortname', '')
+        tactics_map[external_id] = {
+            "name": obj['name'],
+            "shortname": shortname,
+            "description": obj.get('description', '')
+        }
+    else:
+        technique_objects.append((external_id, obj))
 
-for obj in data['objects']:
-    if obj['type'] == 'x-mitre-tactic' and not obj.get('revoked', False):
-        external_refs = obj.get('external_references', [])
-        tactic_id = next((r['external_id'] for r in external_refs if r['source_name'] == 'mitre-attack'), None)
-
-        if tactic_id:
-            # x_mitre_shortname is the kill chain phase name (e.g., "initial-access")
-            shortname = obj.get('x_mitre_shortname', '')
-            tactics_map[tactic_id] = {
-                "name": obj['name'],
-                "shortname": shortname,
-                "description": obj.get('description', '')
-            }
+# ============================================================================
+# TACTICS
+# ============================================================================
 
 # Define kill chain order (this is stable and part of the framework definition)
 KILL_CHAIN_ORDER = [
@@ -46,35 +100,42 @@ KILL_CHAIN_ORDER = [
     "TA0040",  # Impact
 ]
 
-# Build ordered tactics list with display-friendly short names
+# Kill chain position of each tactic ID
+KILL_CHAIN_INDEX = {tactic_id: idx for idx, tactic_id in enumerate(KILL_CHAIN_ORDER)}
+
+# Display-friendly short names for the UI
+DISPLAY_SHORTNAMES = {
+    "TA0043": "Reconnaissance",
+    "TA0042": "Resource Dev",
+    "TA0001": "Initial Access",
+    "TA0002": "Execution",
+    "TA0003": "Persistence",
+    "TA0004": "Priv Escalation",
+    "TA0005": "Defense Evasion",
+    "TA0006": "Cred Access",
+    "TA0007": "Discovery",
+    "TA0008": "Lateral Move",
+    "TA0009": "Collection",
+    "TA0011": "C2",
+    "TA0010": "Exfiltration",
+    "TA0040": "Impact",
+}
+
+# Build ordered tactics list with display-friendly short names, driven by the
+# extracted tactics (tactics outside the kill chain are skipped)
 tactics_list = []
-for idx, tactic_id in enumerate(KILL_CHAIN_ORDER):
-    if tactic_id in tactics_map:
-        tactic = tactics_map[tactic_id]
-        # Create display-friendly short names for the UI
-        display_shortnames = {
-            "TA0043": "Reconnaissance",
-            "TA0042": "Resource Dev",
-            "TA0001": "Initial Access",
-            "TA0002": "Execution",
-            "TA0003": "Persistence",
-            "TA0004": "Priv Escalation",
-            "TA0005": "Defense Evasion",
-            "TA0006": "Cred Access",
-            "TA0007": "Discovery",
-            "TA0008": "Lateral Move",
-            "TA0009": "Collection",
-            "TA0011": "C2",
-            "TA0010": "Exfiltration",
-            "TA0040": "Impact",
-        }
-        tactics_list.append({
-            "id": tactic_id,
-            "name": tactic['name'],
-            "shortname": display_shortnames.get(tactic_id, tactic['name']),
-            "kill_chain_phase": tactic['shortname'],
-            "order": idx
-        })
+for tactic_id, tactic in tactics_map.items():
+    order = KILL_CHAIN_INDEX.get(tactic_id)
+    if order is None:
+        continue
+    tactics_list.append({
+        "id": tactic_id,
+        "name": tactic['name'],
+        "shortname": DISPLAY_SHORTNAMES.get(tactic_id, tactic['name']),
+        "kill_chain_phase": tactic['shortname'],
+        "order": order
+    })
+tactics_list.sort(key=itemgetter('order'))
 
 # Build slug to ID mapping from extracted data
 tactic_slug_to_id = {t['kill_chain_phase']: t['id'] for t in tactics_list}
@@ -82,29 +143,23 @@ tactic_slug_to_id = {t['kill_chain_phase']: t['id'] for t in tactics_list}
 print(f"Extracted {len(tactics_list)} tactics")
 
 # ============================================================================
-# TECHNIQUES EXTRACTION
+# TECHNIQUES
 # ============================================================================
 techniques_map = {}
 
-for obj in data['objects']:
-    if obj['type'] == 'attack-pattern' and not obj.get('revoked', False):
-        external_refs = obj.get('external_references', [])
-        mitre_id = next((r['external_id'] for r in external_refs if r['source_name'] == 'mitre-attack'), None)
+for mitre_id, obj in technique_objects:
+    # Convert ATT&CK kill chain slugs to tactic IDs (one lookup per slug)
+    tactic_ids = []
+    for phase in obj.get('kill_chain_phases', ()):
+        if phase['kill_chain_name'] == 'mitre-attack':
+            tactic_id = tactic_slug_to_id.get(phase['phase_name'])
+            if tactic_id is not None:
+                tactic_ids.append(tactic_id)
 
-        if mitre_id:
-            tactic_slugs = []
-            if 'kill_chain_phases' in obj:
-                for phase in obj['kill_chain_phases']:
-                    if phase['kill_chain_name'] == 'mitre-attack':
-                        tactic_slugs.append(phase['phase_name'])
-
-            # Convert slugs to tactic IDs
-            tactic_ids = [tactic_slug_to_id.get(slug) for slug in tactic_slugs if slug in tactic_slug_to_id]
-
-            techniques_map[mitre_id] = {
-                "name": obj['name'],
-                "tactic_ids": tactic_ids
-            }
+    techniques_map[mitre_id] = {
+        "name": obj['name'],
+        "tactic_ids": tactic_ids
+    }
 
 print(f"Extracted {len(techniques_map)} techniques")
 
@@ -116,12 +171,24 @@ final_db = {
     "techniques": techniques_map
 }
 
-# Ensure directory exists
-os.makedirs("data", exist_ok=True)
-
-with open("data/mitre_data.json", "w") as f:
-    json.dump(final_db, f, indent=2)
-
-print(f"Success! Created data/mitre_data.json")
+# Full schema for the server
+DATA_FILE.parent.mkdir(parents=True, exist_ok=True)
+DATA_FILE.write_bytes(orjson.dumps(final_db, option=orjson.OPT_INDENT_2))
+
+# Flat technique map (id -> {name, tactic_ids}) from the same data. Nothing in
+# the tree reads it; it is the committed copy served as /static/mitre_data.json,
+# regenerated here so it no longer goes stale next to data/mitre_data.json
+STATIC_FILE.parent.mkdir(parents=True, exist_ok=True)
+STATIC_FILE.write_bytes(orjson.dumps(techniques_map, option=orjson.OPT_INDENT_2))
+
+# Remember which upstream version these files were built from
+etag = response.headers.get("ETag")
+if etag:
+    ETAG_FILE.write_text(etag + "\n")
+else:
+    # A stale ETag would describe an older bundle than the files just written
+    ETAG_FILE.unlink(missing_ok=True)
+
+print(f"Success! Created {DATA_FILE} and {STATIC_FILE}")
 print(f"  - {len(tactics_list)} tactics")
-print(f"  - {len(techniques_map)} techniques")
\ No newline at end of file
+print(f"  - {len(techniques_map)} techniques")